@@ -0,0 +1,60 @@
+from dataclasses import dataclass
+
+import pandas as pd
+
+from municipios import COLUNA_ID
+
+# ================== CATÁLOGO DE METADADOS DA ABA ==================
+# Montado uma vez por versão: linhas, e para cada coluna o tipo, a fração de
+# vazios e os valores distintos (na ordem em que aparecem) com suas contagens.
+# Filtros, resumo e exportação leem daqui em vez de varrer o DataFrame. O id
+# de município é interno (vale só dentro do processo): serve ao filtro, mas
+# fica fora das colunas mostradas e exportadas.
+@dataclass(frozen=True)
+class ColunaCatalogo:
+    nome: str
+    tipo: str
+    nulos: float  # fração de células vazias
+    contagens: pd.Series  # valor distinto -> linhas, vazios incluídos
+
+    @property
+    def valores(self):
+        return list(self.contagens.index)
+
+    def contagem(self, valor):
+        if pd.isna(valor):
+            return int(self.contagens[self.contagens.index.isna()].sum())
+        return int(self.contagens.get(valor, 0))
+
+class Catalogo:
+    def __init__(self, entrada):
+        df = entrada.df
+        self._entrada = entrada
+        self.linhas = len(df)
+        self.colunas = {nome: _catalogar(nome, df[nome]) for nome in colunas_visiveis(df)}
+        self.internas = {nome: _catalogar(nome, df[nome]) for nome in df.columns if nome == COLUNA_ID}
+
+    def coluna(self, nome):
+        return self.colunas[nome] if nome in self.colunas else self.internas[nome]
+
+    def data_obtencao(self):
+        # Lida da entrada: uma revalidação sem mudança de conteúdo atualiza a data, não o catálogo
+        return self._entrada.data_obtencao()
+
+    def tabela(self):
+        return pd.DataFrame(
+            [(coluna.nome, coluna.tipo, len(coluna.contagens), round(coluna.nulos, 4)) for coluna in self.colunas.values()],
+            columns=["Coluna", "Tipo", "Valores distintos", "Fração de vazios"],
+        )
+
+def colunas_visiveis(df):
+    return [nome for nome in df.columns if nome != COLUNA_ID]
+
+def _catalogar(nome, serie):
+    valores = pd.unique(serie)
+    contagens = serie.value_counts(dropna=False, sort=False)
+    contagens = contagens[contagens > 0].reindex(pd.Index(valores, dtype=object), fill_value=0)
+    return ColunaCatalogo(nome, str(serie.dtype), float(serie.isna().mean()) if len(serie) else 0.0, contagens)
+
+def catalogo(entrada):
+    return entrada.derivado("catalogo", lambda: Catalogo(entrada))
@@ -0,0 +1,847 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from contextlib import closing, contextmanager
+from datetime import datetime
+
+import pandas as pd
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from esquemas import aplicar_dicionarios, converter_numeros, esquema_da_aba, ler_cabecalho, tipo_leitura
+from municipios import COLUNA_ID
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import gspread
+except ImportError:  # a carga em lote é opcional
+    gspread = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # sem pyarrow o cache compartilhado fica desativado
+    pa = feather = None
+
+# ================== VERSÃO DE UMA ABA ==================
+# Uma entrada guarda o DataFrame já tratado, a impressão digital do CSV que o
+# originou e os validadores HTTP (ETag/Last-Modified) da resposta. Enquanto a
+# versão não muda, a mesma entrada é reaproveitada, junto com tudo o que foi
+# derivado dela. Entradas montadas a partir de outras (visão 360) listam em
+# `avisos` as fontes que ficaram de fora: (nome da aba, colunas ausentes).
+class EntradaCache:
+    def __init__(self, df, obtido_em, versao=None, validadores=None, avisos=None):
+        self.df = df
+        self.obtido_em = obtido_em
+        self.versao = versao
+        self.validadores = validadores or {}
+        self.avisos = avisos or []
+        self.atualizando = False
+        self._derivados = {}
+        self._lock = threading.Lock()
+
+    def idade(self):
+        return time.time() - self.obtido_em
+
+    def data_obtencao(self):
+        return datetime.fromtimestamp(self.obtido_em)
+
+    def confirmar(self, obtido_em=None, validadores=None):
+        # A origem respondeu com o mesmo conteúdo: só renova o carimbo de tempo
+        self.obtido_em = obtido_em or time.time()
+        if validadores:
+            self.validadores = validadores
+        return self
+
+    def derivado(self, nome, calcular):
+        with self._lock:
+            if nome not in self._derivados:
+                self._derivados[nome] = calcular()
+            return self._derivados[nome]
+
+def impressao_digital(conteudo):
+    return hashlib.blake2b(conteudo, digest_size=16).hexdigest()
+
+# ================== CACHE COMPARTILHADO ENTRE PROCESSOS ==================
+# Todos os workers do mesmo host leem e gravam no mesmo backend, chaveado pela
+# URL da aba (índice com versão, data e validadores) e pela versão do conteúdo
+# (tabela Arrow). Um bloqueio de arquivo por URL garante que só um processo
+# baixe e interprete cada aba; os demais usam o que ele gravou.
+PASTA_SNAPSHOTS = os.environ.get(
+    "NRC_PASTA_SNAPSHOTS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots"),
+)
+IDADE_MAXIMA_SNAPSHOT = 3600  # segundos, mesmo prazo do cache em memória
+CARENCIA_LIXO = 300  # segundos: conteúdo recém-gravado não é apagado mesmo sem índice (ver _coletar_lixo)
+VERSAO_INGESTAO = 7  # incrementar quando o tratamento das abas mudar: invalida o que já foi gravado
+
+def chave_planilha(sheet_url):
+    encontrado = re.search(r"/spreadsheets/d/([^/]+)", sheet_url)
+    planilha = encontrado.group(1) if encontrado else "desconhecida"
+    consulta = urllib.parse.parse_qs(urllib.parse.urlparse(sheet_url).query)
+    aba = consulta.get("sheet", [""])[0]
+    return planilha, aba
+
+@contextmanager
+def bloqueio_arquivo(caminho):
+    if fcntl is None:  # sem flock (Windows): fica só o single-flight do processo
+        yield
+        return
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho, "a") as arquivo:
+        fcntl.flock(arquivo, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(arquivo, fcntl.LOCK_UN)
+
+def _para_tabela(entrada):
+    # Os ids de município valem só dentro do processo: não vão para o cache compartilhado
+    return pa.Table.from_pandas(entrada.df.drop(columns=[COLUNA_ID], errors="ignore"), preserve_index=False)
+
+class BackendDisco:
+    # Índice JSON por aba + um Feather sem compressão por versão, lido por memory-map
+    def __init__(self, pasta=PASTA_SNAPSHOTS, idade_maxima=IDADE_MAXIMA_SNAPSHOT):
+        self.pasta = os.path.join(pasta, f"v{VERSAO_INGESTAO}")
+        self.idade_maxima = idade_maxima
+
+    def _caminho_indice(self, sheet_url):
+        planilha, aba = chave_planilha(sheet_url)
+        nome = urllib.parse.quote(aba, safe="")
+        tq = urllib.parse.parse_qs(urllib.parse.urlparse(sheet_url).query).get("tq")
+        if tq:  # consultas projetadas têm entrada própria
+            nome += "~" + impressao_digital(tq[0].encode())[:12]
+        return os.path.join(self.pasta, planilha, nome + ".json")
+
+    def _caminho_conteudo(self, versao):
+        return os.path.join(self.pasta, "conteudos", f"{versao}.feather")
+
+    def _gravar_atomico(self, caminho, gravar):
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            gravar(temporario)
+            os.replace(temporario, caminho)  # troca atômica: leitores nunca veem arquivo pela metade
+        except (OSError, ValueError, TypeError):
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            return False
+        return True
+
+    def _gravar_indice(self, sheet_url, entrada):
+        indice = {"versao": entrada.versao, "obtido_em": entrada.obtido_em, "validadores": entrada.validadores}
+
+        def gravar(caminho):
+            with open(caminho, "w", encoding="utf-8") as arquivo:
+                json.dump(indice, arquivo)
+
+        self._gravar_atomico(self._caminho_indice(sheet_url), gravar)
+
+    def ler(self, sheet_url, aceitar_antigo=False, idade_maxima=None):
+        idade_maxima = self.idade_maxima if idade_maxima is None else idade_maxima
+        if feather is None:
+            return None
+        try:
+            with open(self._caminho_indice(sheet_url), encoding="utf-8") as arquivo:
+                indice = json.load(arquivo)
+            if time.time() - indice["obtido_em"] > idade_maxima and not aceitar_antigo:
+                return None
+            tabela = feather.read_table(self._caminho_conteudo(indice["versao"]), memory_map=True)
+        except (OSError, ValueError, KeyError):
+            return None
+        df = aplicar_dicionarios(tabela.to_pandas(), esquema_da_aba(sheet_url))
+        return EntradaCache(df, indice["obtido_em"], indice["versao"], indice["validadores"])
+
+    def gravar(self, sheet_url, entrada):
+        if feather is None:
+            return
+        caminho = self._caminho_conteudo(entrada.versao)
+        nova = not os.path.exists(caminho)
+        if nova:  # versões são imutáveis: grava uma vez só
+            gravado = self._gravar_atomico(
+                caminho, lambda temporario: feather.write_feather(_para_tabela(entrada), temporario, compression="uncompressed")
+            )
+            if not gravado:
+                return
+        self._gravar_indice(sheet_url, entrada)
+        if nova:  # a versão anterior desta aba pode ter ficado sem índice
+            self._coletar_lixo()
+
+    def _coletar_lixo(self):
+        # Apaga as versões que nenhum índice aponta mais. As gravadas há pouco
+        # ficam: outro worker pode estar entre gravar o conteúdo e o índice.
+        # Quem ainda tem uma versão apagada em memory-map continua lendo normalmente.
+        pasta_conteudos = os.path.join(self.pasta, "conteudos")
+        em_uso = set()
+        for raiz, _, arquivos in os.walk(self.pasta):
+            if raiz == pasta_conteudos:
+                continue
+            for nome in arquivos:
+                if not nome.endswith(".json"):
+                    continue
+                try:
+                    with open(os.path.join(raiz, nome), encoding="utf-8") as arquivo:
+                        em_uso.add(json.load(arquivo)["versao"])
+                except (OSError, ValueError, KeyError):
+                    return  # índice ilegível: na dúvida, não apaga nada
+        limite = time.time() - CARENCIA_LIXO
+        for nome in os.listdir(pasta_conteudos):
+            versao, extensao = os.path.splitext(nome)
+            if extensao != ".feather" or versao in em_uso:
+                continue
+            try:
+                if os.path.getmtime(os.path.join(pasta_conteudos, nome)) < limite:
+                    os.remove(os.path.join(pasta_conteudos, nome))
+            except OSError:  # já apagado por outro worker
+                pass
+
+    def renovar(self, sheet_url, entrada):
+        if feather is not None:
+            self._gravar_indice(sheet_url, entrada)
+
+    def bloquear(self, sheet_url):
+        return bloqueio_arquivo(self._caminho_indice(sheet_url) + ".lock")
+
+class BackendSQLite:
+    # Mesmo modelo em um único arquivo SQLite (WAL), para hosts em que vários
+    # workers preferem um banco a uma árvore de arquivos
+    def __init__(self, caminho=None, idade_maxima=IDADE_MAXIMA_SNAPSHOT):
+        self.caminho = caminho or os.path.join(PASTA_SNAPSHOTS, f"cache-v{VERSAO_INGESTAO}.sqlite3")
+        self.idade_maxima = idade_maxima
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute("PRAGMA journal_mode=WAL")
+            conexao.execute(
+                "CREATE TABLE IF NOT EXISTS planilhas ("
+                "url TEXT PRIMARY KEY, versao TEXT NOT NULL, obtido_em REAL NOT NULL, validadores TEXT NOT NULL)"
+            )
+            conexao.execute("CREATE TABLE IF NOT EXISTS conteudos (versao TEXT PRIMARY KEY, dados BLOB NOT NULL)")
+
+    def _conectar(self):
+        return sqlite3.connect(self.caminho, timeout=30)
+
+    def ler(self, sheet_url, aceitar_antigo=False, idade_maxima=None):
+        idade_maxima = self.idade_maxima if idade_maxima is None else idade_maxima
+        if pa is None:
+            return None
+        with closing(self._conectar()) as conexao:
+            linha = conexao.execute(
+                "SELECT p.versao, p.obtido_em, p.validadores, c.dados FROM planilhas p "
+                "JOIN conteudos c ON c.versao = p.versao WHERE p.url = ?",
+                (sheet_url,),
+            ).fetchone()
+        if linha is None:
+            return None
+        versao, obtido_em, validadores, dados = linha
+        if time.time() - obtido_em > idade_maxima and not aceitar_antigo:
+            return None
+        tabela = pa.ipc.open_file(pa.py_buffer(dados)).read_all()
+        df = aplicar_dicionarios(tabela.to_pandas(), esquema_da_aba(sheet_url))
+        return EntradaCache(df, obtido_em, versao, json.loads(validadores))
+
+    def gravar(self, sheet_url, entrada):
+        if pa is None:
+            return
+        tabela = _para_tabela(entrada)
+        saida = pa.BufferOutputStream()
+        with pa.ipc.new_file(saida, tabela.schema) as escritor:
+            escritor.write_table(tabela)
+        with closing(self._conectar()) as conexao, conexao:
+            conexao.execute(
+                "INSERT OR IGNORE INTO conteudos (versao, dados) VALUES (?, ?)",
+                (entrada.versao, saida.getvalue().to_pybytes()),
+            )
+            self._gravar_indice(conexao, sheet_url, entrada)
+            # Na mesma transação: some a versão que nenhuma aba aponta mais
+            conexao.execute("DELETE FROM conteudos WHERE versao NOT IN (SELECT versao FROM planilhas)")
+
+    def _gravar_indice(self, conexao, sheet_url, entrada):
+        conexao.execute(
+            "INSERT OR REPLACE INTO planilhas (url, versao, obtido_em, validadores) VALUES (?, ?, ?, ?)",
+            (sheet_url, entrada.versao, entrada.obtido_em, json.dumps(entrada.validadores)),
+        )
+
+    def renovar(self, sheet_url, entrada):
+        with closing(self._conectar()) as conexao, conexao:
+            self._gravar_indice(conexao, sheet_url, entrada)
+
+    def bloquear(self, sheet_url):
+        return bloqueio_arquivo(f"{self.caminho}.{impressao_digital(sheet_url.encode())}.lock")
+
+BACKENDS = {"disco": BackendDisco, "sqlite": BackendSQLite}
+
+armazenamento = BACKENDS[os.environ.get("NRC_CACHE_BACKEND", "disco")]()
+
+# ================== LEITURA DAS PLANILHAS ==================
+# Sessão HTTP única e reaproveitada (pool de conexões keep-alive), com gzip,
+# limites de tempo de conexão/leitura e novas tentativas com jitter.
+TEMPO_LIMITE = (5, 30)  # segundos: (conexão, leitura)
+TENTATIVAS = 3
+ESPERA_BASE = 0.5  # segundos, dobra a cada tentativa
+STATUS_TRANSITORIOS = {429, 500, 502, 503, 504}
+
+def _criar_sessao():
+    sessao = requests.Session()
+    sessao.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+    sessao.headers["Accept-Encoding"] = "gzip, deflate"
+    return sessao
+
+sessao_http = _criar_sessao()
+metricas_downloads = deque(maxlen=200)  # últimos downloads: latência e bytes
+
+def metricas_http():
+    return list(metricas_downloads)
+
+def baixar_conteudo(sheet_url, validadores=None):
+    # Retorna (bytes, validadores); bytes é None quando a origem responde 304
+    validadores = validadores or {}
+    cabecalhos = {}
+    if validadores.get("etag"):
+        cabecalhos["If-None-Match"] = validadores["etag"]
+    if validadores.get("last_modified"):
+        cabecalhos["If-Modified-Since"] = validadores["last_modified"]
+    inicio = time.perf_counter()
+    for tentativa in range(1, TENTATIVAS + 1):
+        try:
+            resposta = sessao_http.get(sheet_url, headers=cabecalhos, timeout=TEMPO_LIMITE, stream=True)
+            if resposta.status_code in STATUS_TRANSITORIOS and tentativa < TENTATIVAS:
+                resposta.close()
+                raise requests.HTTPError(f"HTTP {resposta.status_code}", response=resposta)
+            with resposta:
+                if resposta.status_code == 304:
+                    conteudo = None
+                else:
+                    resposta.raise_for_status()
+                    # O corpo vem em blocos, já descomprimido, direto para o buffer do parser
+                    buffer = io.BytesIO()
+                    for bloco in resposta.iter_content(chunk_size=64 * 1024):
+                        buffer.write(bloco)
+                    conteudo = buffer.getvalue()
+                bytes_rede = resposta.raw.tell()
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as erro:
+            transitorio = not isinstance(erro, requests.HTTPError) or erro.response.status_code in STATUS_TRANSITORIOS
+            if tentativa == TENTATIVAS or not transitorio:
+                raise
+            time.sleep(random.uniform(0, ESPERA_BASE * 2 ** tentativa))  # full jitter
+    metricas_downloads.append({
+        "aba": urllib.parse.unquote(chave_planilha(sheet_url)[1]),
+        "status": resposta.status_code,
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "bytes_rede": bytes_rede,
+        "bytes": len(conteudo) if conteudo is not None else 0,
+        "tentativas": tentativa,
+        "instante": datetime.now().strftime("%H:%M:%S"),
+    })
+    if conteudo is None:
+        return None, validadores
+    novos = {"etag": resposta.headers.get("ETag"), "last_modified": resposta.headers.get("Last-Modified")}
+    return conteudo, {chave: valor for chave, valor in novos.items() if valor}
+
+def interpretar_csv(conteudo, esquema=None):
+    if esquema is None:
+        df = pd.read_csv(io.BytesIO(conteudo))
+        df = df.loc[:, ~df.columns.str.contains('^Unnamed')]  # Remove colunas Unnamed
+        df.columns = df.columns.str.strip()  # Limpa espaços extras
+        return df
+    cabecalho = ler_cabecalho(conteudo)
+    nomes = {bruto: esquema.canonico(bruto) for bruto in cabecalho}
+    # Colunas sem nome (as "Unnamed") e fora do esquema ficam de fora já na leitura
+    usar = [
+        bruto for bruto in cabecalho
+        if bruto.strip() and not bruto.startswith("Unnamed")
+        and (esquema.colunas is None or nomes[bruto] in esquema.colunas)
+    ]
+    tipos = {bruto: tipo_leitura(esquema.tipos[nomes[bruto]]) for bruto in usar if nomes[bruto] in esquema.tipos}
+    # O parser pyarrow é multithread, mas não aceita cabeçalhos repetidos
+    motor = "pyarrow" if pa is not None and len(set(cabecalho)) == len(cabecalho) else "c"
+    df = pd.read_csv(io.BytesIO(conteudo), engine=motor, usecols=usar, dtype=tipos)
+    df = df.rename(columns=lambda nome: esquema.canonico(str(nome)))
+    return aplicar_dicionarios(converter_numeros(df, esquema), esquema)
+
+def versao_de_linhas(linhas):
+    # Versão pelo conteúdo das células, não pelos bytes: o CSV do gviz e a API
+    # (que corta células vazias no fim de cada linha, e linhas vazias no fim)
+    # dão a mesma versão para o mesmo conteúdo
+    normalizadas = []
+    for linha in linhas:
+        linha = [str(valor) for valor in linha]
+        while linha and linha[-1] == "":
+            linha.pop()
+        normalizadas.append(linha)
+    while normalizadas and not normalizadas[-1]:
+        normalizadas.pop()
+    return impressao_digital(json.dumps(normalizadas, ensure_ascii=False).encode())
+
+def csv_de_linhas(linhas):
+    # Linhas vindas da API no mesmo formato do CSV do gviz: um só interpretador
+    # para os dois caminhos. A API corta células vazias no fim de cada linha
+    largura = max(map(len, linhas), default=0)
+    texto = io.StringIO()
+    csv.writer(texto, lineterminator="\n").writerows(linha + [""] * (largura - len(linha)) for linha in linhas)
+    return texto.getvalue().encode("utf-8")
+
+def ler_planilha(sheet_url, anterior=None, idade_maxima=None):
+    # Versão recente no cache compartilhado (deste ou de outro worker) dispensa a
+    # rede; "recente" segue o TTL de quem pede (por padrão, o do backend)
+    recente = armazenamento.ler(sheet_url, idade_maxima=idade_maxima)
+    if recente is None:
+        with armazenamento.bloquear(sheet_url):
+            # Quem esperou pelo bloqueio encontra o que o outro processo gravou
+            recente = armazenamento.ler(sheet_url, idade_maxima=idade_maxima)
+            if recente is None:
+                return _baixar_e_interpretar(sheet_url, anterior)
+    if anterior is not None and recente.versao == anterior.versao:
+        return anterior.confirmar(recente.obtido_em)
+    return recente
+
+def _baixar_e_interpretar(sheet_url, anterior):
+    if anterior is None:
+        anterior = armazenamento.ler(sheet_url, aceitar_antigo=True)
+    try:
+        conteudo, validadores = baixar_conteudo(sheet_url, anterior.validadores if anterior else None)
+    except Exception:
+        # Sem rede ou Google fora do ar: serve a última versão, mesmo antiga
+        if anterior is None:
+            raise
+        return anterior
+    versao = versao_de_linhas(csv.reader(io.StringIO(conteudo.decode("utf-8-sig")))) if conteudo is not None else None
+    if anterior is not None and (conteudo is None or versao == anterior.versao):
+        # Conteúdo idêntico: nada de read_csv, limpeza ou agregados novos
+        armazenamento.renovar(sheet_url, anterior.confirmar(validadores=validadores))
+        return anterior
+    entrada = EntradaCache(interpretar_csv(conteudo, esquema_da_aba(sheet_url)), time.time(), versao, validadores)
+    armazenamento.gravar(sheet_url, entrada)
+    return entrada
+
+# ================== CONSULTAS GVIZ (PROJEÇÃO NA ORIGEM) ==================
+# A Query Language do gviz referencia colunas pelas letras (A, B, ...), então
+# o cabeçalho de cada aba é lido ("select * limit 0") para traduzir os nomes.
+# Uma consulta é um dict {"colunas": [...]}. O CacheAbas resolve a URL de cada
+# consulta uma vez e só relê o cabeçalho ao revalidar a aba em segundo plano.
+_cabecalhos = {}
+_cabecalhos_lock = threading.Lock()
+
+def letra_coluna(indice):
+    letras = ""
+    indice += 1
+    while indice:
+        indice, resto = divmod(indice - 1, 26)
+        letras = chr(ord("A") + resto) + letras
+    return letras
+
+def url_consulta(sheet_url, tq):
+    return f"{sheet_url}&tq={urllib.parse.quote(tq)}"
+
+def cabecalho_planilha(sheet_url, idade_maxima=IDADE_MAXIMA_SNAPSHOT):
+    with _cabecalhos_lock:
+        guardado = _cabecalhos.get(sheet_url)
+    if guardado is not None and time.time() - guardado[1] < idade_maxima:
+        return guardado[0]
+    conteudo, _ = baixar_conteudo(url_consulta(sheet_url, "select * limit 0"))
+    linha = next(csv.reader(io.StringIO(conteudo.decode("utf-8-sig"))), [])
+    letras = {nome.strip(): letra_coluna(indice) for indice, nome in enumerate(linha) if nome.strip()}
+    with _cabecalhos_lock:
+        _cabecalhos[sheet_url] = (letras, time.time())
+    return letras
+
+def montar_consulta(letras, colunas=None):
+    if not colunas:
+        return ""
+    return "select " + ", ".join(letras[coluna] for coluna in colunas)
+
+def montar_url_consulta(sheet_url, consulta, idade_maxima=IDADE_MAXIMA_SNAPSHOT):
+    # Levanta exceção se o cabeçalho não puder ser lido ou não tiver as colunas pedidas
+    tq = montar_consulta(cabecalho_planilha(sheet_url, idade_maxima), **consulta)
+    return url_consulta(sheet_url, tq) if tq else sheet_url
+
+def resolver_consulta(sheet_url, consulta=None):
+    # URL com o tq montado; se o cabeçalho falhar, a URL da aba inteira, com o
+    # esquema limitando as colunas
+    if not consulta:
+        return sheet_url
+    try:
+        return montar_url_consulta(sheet_url, consulta)
+    except (KeyError, requests.RequestException, UnicodeDecodeError):
+        return sheet_url
+
+def _projetada(sheet_url):
+    return "tq" in urllib.parse.parse_qs(urllib.parse.urlparse(sheet_url).query)
+
+# ================== CARGA EM LOTE PELA API DO GOOGLE SHEETS ==================
+# Com uma conta de serviço em st.secrets["gcp_service_account"], todas as abas
+# de uma planilha vêm em uma única chamada values:batchGet, com os valores
+# como aparecem na planilha (FORMATTED_VALUE, os mesmos textos do CSV do gviz:
+# "28,14%" continua 28,14 e não vira 0,2814), pela sessão autenticada que o
+# gspread mantém. As linhas passam pelo mesmo interpretador e pela mesma
+# versão (versao_de_linhas) do CSV, então trocar de caminho não invalida nada.
+# A revalidação em segundo plano usa a API também, uma chamada por planilha.
+# Sem credenciais, ou se a API falhar, vale o caminho gviz/CSV de sempre.
+ESCOPOS_SHEETS = ["https://www.googleapis.com/auth/spreadsheets.readonly"]
+
+def credenciais_disponiveis():
+    try:
+        return gspread is not None and "gcp_service_account" in st.secrets
+    except FileNotFoundError:  # sem secrets.toml
+        return False
+
+def _intervalo_a1(titulo):
+    return "'" + titulo.replace("'", "''") + "'"
+
+class CarregadorGspread:
+    # `cliente` pode ser qualquer objeto com open_by_key(id).values_batch_get(...),
+    # o que permite trocar a API por um falso local nos testes
+    def __init__(self, cliente=None):
+        self._cliente = cliente
+        self._planilhas = {}
+        self._lock = threading.Lock()
+
+    def _planilha(self, planilha_id):
+        with self._lock:
+            if self._cliente is None:
+                self._cliente = gspread.service_account_from_dict(
+                    dict(st.secrets["gcp_service_account"]), scopes=ESCOPOS_SHEETS
+                )
+            if planilha_id not in self._planilhas:
+                self._planilhas[planilha_id] = self._cliente.open_by_key(planilha_id)
+            return self._planilhas[planilha_id]
+
+    def ler_abas(self, planilha_id, titulos):
+        resposta = self._planilha(planilha_id).values_batch_get(
+            [_intervalo_a1(titulo) for titulo in titulos],
+            params={"valueRenderOption": "FORMATTED_VALUE"},
+        )
+        tabelas = {}
+        for titulo, intervalo in zip(titulos, resposta.get("valueRanges", [])):
+            valores = intervalo.get("values", [])
+            tabelas[titulo] = (valores, versao_de_linhas(valores))
+        return tabelas
+
+# ================== CACHE COM REVALIDAÇÃO EM SEGUNDO PLANO ==================
+# Stale-while-revalidate: passado o TTL, a última versão boa continua sendo
+# servida na hora e uma thread busca a nova. Só a primeira carga de cada aba
+# sem cópia no cache compartilhado bloqueia o usuário.
+#
+# A memória tem orçamento em bytes (tamanho medido de cada DataFrame): passado
+# o limite, sai o conteúdo usado há mais tempo, e a aba volta a ser lida do
+# cache compartilhado no próximo acesso, pelo mesmo caminho de uma falta
+# (cópia vencida servida na hora e revalidada). Conteúdos idênticos (mesma
+# versão e mesmo esquema) pedidos por URLs diferentes ocupam a memória uma vez
+# só. O orçamento conta só os DataFrames: os derivados (índices, cubos,
+# catálogo) saem junto com a entrada, e os arquivos de exportacao.exportacoes
+# e os resultados de indices.resultados são limitados por número de itens.
+ORCAMENTO_MEMORIA = int(os.environ.get("NRC_CACHE_MEMORIA_MB", "512")) * 1024 * 1024
+
+class CacheAbas:
+    def __init__(self, ttl=3600, max_workers=2, carregador_lote=None, orcamento_bytes=ORCAMENTO_MEMORIA):
+        self.ttl = ttl
+        self.carregador_lote = carregador_lote
+        self.orcamento_bytes = orcamento_bytes
+        self.bytes_usados = 0
+        self.contadores = {"acertos": 0, "faltas": 0, "despejos": 0, "deduplicadas": 0}
+        self._entradas = {}
+        self._conteudos = OrderedDict()  # (versão, esquema) -> [DataFrame, bytes, URLs que o usam]
+        self._em_voo = {}
+        self._resolvidas = {}  # (URL da aba, consulta) -> URL projetada
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="revalidacao")
+
+    def obter(self, sheet_url, consulta=None):
+        # Com a carga em lote a aba já chega inteira, guardada pela URL da aba:
+        # a projeção gviz custaria mais duas chamadas (cabeçalho e consulta) e
+        # uma segunda cópia. Fica como quando o cabeçalho não pode ser lido: a
+        # aba inteira, com o esquema limitando as colunas e o app filtrando
+        if self.carregador_lote is None and consulta:
+            sheet_url = self._resolver(sheet_url, consulta)
+        with self._lock:
+            entrada = self._entradas.get(sheet_url)
+            if entrada is not None:
+                self.contadores["acertos"] += 1
+                self._conteudos.move_to_end(self._chave_conteudo(sheet_url, entrada))
+            else:
+                self.contadores["faltas"] += 1
+        if entrada is None:
+            return self._buscar(sheet_url)
+        if entrada.idade() > self.ttl:
+            self._revalidar(sheet_url, entrada)
+        return entrada
+
+    def _buscar(self, sheet_url, anterior=None):
+        # Single-flight: uma única busca em voo por URL; as demais sessões
+        # que pedirem a mesma aba esperam o resultado dela.
+        with self._lock:
+            if anterior is None and sheet_url in self._entradas:
+                return self._entradas[sheet_url]
+            futuro = self._em_voo.get(sheet_url)
+            lider = futuro is None
+            if lider:
+                futuro = self._em_voo[sheet_url] = Future()
+        if not lider:
+            return futuro.result()
+        try:
+            # Falta na memória com cópia no cache compartilhado, mesmo vencida:
+            # serve a cópia já e revalida em segundo plano, como num acerto
+            entrada = armazenamento.ler(sheet_url, aceitar_antigo=True) if anterior is None else None
+            if entrada is None:
+                entrada = ler_planilha(sheet_url, anterior, self.ttl)
+        except BaseException as erro:
+            with self._lock:
+                del self._em_voo[sheet_url]
+            futuro.set_exception(erro)
+            raise
+        with self._lock:
+            self._guardar(sheet_url, entrada)
+            del self._em_voo[sheet_url]
+        futuro.set_result(entrada)
+        if entrada.idade() > self.ttl:
+            self._revalidar(sheet_url, entrada)
+        return entrada
+
+    @staticmethod
+    def _chave_conteudo(sheet_url, entrada):
+        return entrada.versao, id(esquema_da_aba(sheet_url))
+
+    def _guardar(self, sheet_url, entrada):
+        # Chamado com self._lock
+        chave = self._chave_conteudo(sheet_url, entrada)
+        conteudo = self._conteudos.get(chave)
+        if conteudo is None:
+            tamanho = int(entrada.df.memory_usage(deep=True).sum())
+            conteudo = self._conteudos[chave] = [entrada.df, tamanho, set()]
+            self.bytes_usados += tamanho
+        else:
+            if conteudo[0] is not entrada.df:
+                entrada.df = conteudo[0]
+                self.contadores["deduplicadas"] += 1
+            self._conteudos.move_to_end(chave)
+
+        anterior = self._entradas.get(sheet_url)
+        if anterior is not None and self._chave_conteudo(sheet_url, anterior) != chave:
+            self._soltar(sheet_url, anterior)
+        conteudo[2].add(sheet_url)
+        self._entradas[sheet_url] = entrada
+        self._despejar()
+
+    def _soltar(self, sheet_url, entrada):
+        chave = self._chave_conteudo(sheet_url, entrada)
+        conteudo = self._conteudos.get(chave)
+        if conteudo is None:
+            return
+        conteudo[2].discard(sheet_url)
+        if not conteudo[2]:
+            del self._conteudos[chave]
+            self.bytes_usados -= conteudo[1]
+
+    def _despejar(self):
+        # O conteúdo recém-guardado está no fim da fila e nunca sai
+        while self.bytes_usados > self.orcamento_bytes and len(self._conteudos) > 1:
+            _, (_, tamanho, urls) = self._conteudos.popitem(last=False)
+            self.bytes_usados -= tamanho
+            for url in urls:
+                del self._entradas[url]
+            self.contadores["despejos"] += 1
+
+    def estatisticas(self):
+        with self._lock:
+            return {
+                **self.contadores,
+                "abas": len(self._entradas),
+                "conteudos": len(self._conteudos),
+                "bytes_usados": self.bytes_usados,
+                "orcamento_bytes": self.orcamento_bytes,
+            }
+
+    def _resolver(self, sheet_url, consulta):
+        # O cabeçalho só é lido no primeiro uso: acertos não tocam a rede
+        chave = (sheet_url, json.dumps(consulta, sort_keys=True))
+        with self._lock:
+            resolvida = self._resolvidas.get(chave)
+        if resolvida is None:
+            resolvida = resolver_consulta(sheet_url, consulta)
+            with self._lock:
+                resolvida = self._resolvidas.setdefault(chave, resolvida)
+        return resolvida
+
+    def _reresolver(self, url):
+        # Na revalidação, relê o cabeçalho das consultas servidas por esta URL.
+        # Se as colunas mudaram de lugar, a consulta passa à nova URL e a cópia
+        # antiga sai da memória; se a leitura falhar, nada muda
+        with self._lock:
+            chaves = [chave for chave, resolvida in self._resolvidas.items() if resolvida == url]
+        for chave in chaves:
+            try:
+                nova = montar_url_consulta(chave[0], json.loads(chave[1]), self.ttl)
+                if nova != url:
+                    self._buscar(nova)
+            except Exception:
+                continue
+            if nova == url:
+                continue
+            with self._lock:
+                self._resolvidas[chave] = nova
+                if _projetada(url) and url not in self._resolvidas.values():
+                    anterior = self._entradas.pop(url, None)
+                    if anterior is not None:
+                        self._soltar(url, anterior)
+        with self._lock:
+            return url in self._entradas
+
+    def _revalidar(self, sheet_url, entrada):
+        with self._lock:
+            if entrada.atualizando:
+                return
+            entrada.atualizando = True
+        self._executor.submit(self._atualizar, sheet_url, entrada)
+
+    def _atualizar(self, sheet_url, entrada):
+        try:
+            # Abas que a carga em lote cobre revalidam por ela; as demais, ou se
+            # a API falhar, pelo gviz
+            if not self._reresolver(sheet_url):
+                return  # a consulta mudou de URL e a nova já foi carregada
+            if sheet_url not in self._revalidar_planilha(sheet_url):
+                self._buscar(sheet_url, entrada)
+        except Exception:
+            pass  # mantém a versão antiga; nova tentativa no próximo acesso
+        finally:
+            entrada.atualizando = False
+
+    def _revalidar_planilha(self, sheet_url):
+        # A aba vencida leva junto, na mesma chamada, as outras vencidas da
+        # mesma planilha; marcadas como em atualização, não disparam a sua
+        if self.carregador_lote is None or _projetada(sheet_url):
+            return set()
+        planilha = chave_planilha(sheet_url)[0]
+        with self._lock:
+            vencidas = [
+                (url, entrada) for url, entrada in self._entradas.items()
+                if url != sheet_url and chave_planilha(url)[0] == planilha and not _projetada(url)
+                and entrada.idade() > self.ttl and not entrada.atualizando
+            ]
+            for _, entrada in vencidas:
+                entrada.atualizando = True
+        try:
+            return self._carregar_planilha(planilha, [sheet_url, *(url for url, _ in vencidas)])
+        finally:
+            for _, entrada in vencidas:
+                entrada.atualizando = False
+
+    def carregar_lote(self, sheet_urls):
+        # Busca pela API, de uma vez por planilha, as abas ausentes ou vencidas
+        if self.carregador_lote is None:
+            return set()
+        por_planilha = {}
+        for url in sheet_urls.values():
+            with self._lock:
+                entrada = self._entradas.get(url)
+            if not _projetada(url) and (entrada is None or entrada.idade() > self.ttl):
+                por_planilha.setdefault(chave_planilha(url)[0], []).append(url)
+        carregadas = set()
+        for planilha, urls in por_planilha.items():
+            carregadas |= self._carregar_planilha(planilha, urls)
+        return carregadas
+
+    def _carregar_planilha(self, planilha, urls):
+        # Uma chamada values:batchGet para as abas pedidas; devolve as URLs atendidas
+        abas = {urllib.parse.unquote(chave_planilha(url)[1]): url for url in urls}
+        try:
+            tabelas = self.carregador_lote.ler_abas(planilha, list(abas))
+        except Exception:
+            return set()  # essas abas seguem pelo gviz
+        tabelas = {titulo: tabela for titulo, tabela in tabelas.items() if tabela[0]}  # aba vazia: fica com o gviz
+        for titulo, (valores, versao) in tabelas.items():
+            url = abas[titulo]
+            with self._lock:
+                anterior = self._entradas.get(url)
+            if anterior is not None and anterior.versao == versao:
+                armazenamento.renovar(url, anterior.confirmar())
+                continue
+            entrada = EntradaCache(interpretar_csv(csv_de_linhas(valores), esquema_da_aba(url)), time.time(), versao)
+            armazenamento.gravar(url, entrada)
+            with self._lock:
+                self._guardar(url, entrada)
+        return {abas[titulo] for titulo in tabelas}
+
+@st.cache_resource
+def obter_cache_abas():
+    return CacheAbas(carregador_lote=CarregadorGspread() if credenciais_disponiveis() else None)
+
+def formatar_idade(segundos):
+    if segundos < 60:
+        return f"{int(segundos)} s"
+    if segundos < 3600:
+        return f"{int(segundos // 60)} min"
+    return f"{int(segundos // 3600)} h {int(segundos % 3600 // 60)} min"
+
+# ================== CACHE LRU DE RESULTADOS ==================
+# Resultados calculados a partir de uma versão (posições filtradas, contagens,
+# arquivos exportados...), compartilhados por todas as sessões do processo.
+# Limitado em número de itens: o menos usado recentemente sai primeiro.
+class CacheLRU:
+    def __init__(self, max_itens=128):
+        self.max_itens = max_itens
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, gerar):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                return self._itens[chave]
+        valor = gerar()
+        with self._lock:
+            self._itens[chave] = valor
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+        return valor
+
+# ================== PRÉ-CARREGAMENTO DAS ABAS ==================
+# Baixa todas as abas em paralelo (pool limitado) pelo mesmo cache usado na
+# carga da aba selecionada, de modo que ele já esteja cheio quando o usuário
+# trocar de aba.
+class PreCarregador:
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="precarga")
+        self._futuros = {}
+        self._lock = threading.Lock()
+
+    def iniciar(self, sheet_urls, carregar, carregar_lote=None, consultas=None):
+        with self._lock:
+            # A carga em lote vai primeiro; cada aba espera por ela e só cai no
+            # carregamento individual se o lote não a trouxe
+            lote = self._executor.submit(carregar_lote, sheet_urls) if carregar_lote else None
+            for aba, url in sheet_urls.items():
+                futuro = self._futuros.get(aba)
+                if futuro is not None and not futuro.done():
+                    continue
+                consulta = (consultas or {}).get(aba)
+                self._futuros[aba] = self._executor.submit(self._carregar, carregar, url, consulta, lote)
+
+    @staticmethod
+    def _carregar(carregar, url, consulta, lote):
+        if lote is not None:
+            wait([lote])
+        return carregar(url, consulta)
+
+    def pendentes(self):
+        with self._lock:
+            return [aba for aba, futuro in self._futuros.items() if not futuro.done()]
+
+@st.cache_resource
+def obter_precarregador():
+    return PreCarregador()
@@ -0,0 +1,160 @@
+import csv
+import io
+import threading
+import urllib.parse
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from municipios import atribuir_municipios
+
+# ================== ESQUEMAS DAS ABAS ==================
+# Para cada aba (pelo nome usado na URL gviz): a coluna de município, os
+# tipos das colunas usadas em filtros e gráficos, os nomes alternativos que
+# já apareceram na planilha e, quando a aba só precisa de parte das colunas,
+# a lista delas. Colunas fora de `colunas` nem chegam a ser interpretadas.
+# As colunas de filtro são categóricas: poucos valores distintos repetidos
+# em todas as linhas viram códigos inteiros. Indicadores ("numero") chegam
+# como texto no formato brasileiro ("3,25", "12,0%") e viram float32.
+@dataclass(frozen=True)
+class Esquema:
+    col_municipio: str
+    tipos: dict = field(default_factory=dict)
+    sinonimos: dict = field(default_factory=dict)
+    colunas: tuple = None
+
+    def canonico(self, nome):
+        nome = nome.strip()
+        return self.sinonimos.get(nome, nome)
+
+    def obrigatorias(self):
+        return {self.col_municipio, *self.tipos, *(self.colunas or ())}
+
+ESQUEMAS = {
+    "UNIDADES INTERLIGADAS": Esquema(
+        col_municipio="MUNICÍPIOS",
+        tipos={"MUNICÍPIOS": "category", "ESFERA": "category", "SITUAÇÃO GERAL": "category"},
+        sinonimos={"MUNICIPIOS": "MUNICÍPIOS", "SITUACAO GERAL": "SITUAÇÃO GERAL"},
+    ),
+    "STATUS RECEB FORMULARIO": Esquema(
+        col_municipio="MUNICÍPIOS",
+        tipos={"MUNICÍPIOS": "category", "STATUS GERAL RECEBIMENTO": "category"},
+        sinonimos={"MUNICIPIOS": "MUNICÍPIOS"},
+    ),
+    "MUNICIPIOS PARA INSTALAR": Esquema(
+        col_municipio="MUNICÍPIOS",
+        tipos={"MUNICÍPIOS": "category"},
+        sinonimos={"MUNICIPIOS": "MUNICÍPIOS"},
+    ),
+    "PROVIMENTO 09": Esquema(
+        col_municipio="MUNICÍPIOS QUE ASSINARAM O TCT",
+        tipos={"MUNICÍPIOS QUE ASSINARAM O TCT": "category"},
+        sinonimos={"MUNICÍPIOS": "MUNICÍPIOS QUE ASSINARAM O TCT"},
+    ),
+    "MUNICÍPIOS PARA REATIVA": Esquema(
+        col_municipio="MUNICÍPIO",
+        tipos={"MUNICÍPIO": "category", "SITUAÇÃO": "category"},
+    ),
+    "TAB ACOMPANHAMENTO ARTICULAÇÃO": Esquema(
+        col_municipio="MUNICÍPIOS",
+        tipos={"MUNICÍPIOS": "category", "SITUAÇÃO": "category"},
+    ),
+    "ÍNDICES DE SUB-REGISTRO": Esquema(
+        col_municipio="CIDADE",
+        tipos={"CIDADE": "category"},
+    ),
+    "CONTATOS": Esquema(
+        col_municipio="MUNICÍPIOS",
+        tipos={"MUNICÍPIOS": "category", "STATUS": "category"},
+    ),
+    "subregistro": Esquema(
+        col_municipio="Nome Município",
+        tipos={"Nome Município": "category", "Sub-registro IBGE(1)": "numero"},
+        colunas=("Nome Município", "Sub-registro IBGE(1)"),
+    ),
+}
+
+# ================== NÚMEROS NO FORMATO BRASILEIRO ==================
+# Vírgula decimal, ponto de milhar e "%" opcional (o valor fica em pontos
+# percentuais). Sem vírgula, o ponto só é milhar no padrão "12.345" ou
+# "1.234.567"; "12.34" continua decimal. Tudo vetorizado sobre a coluna; o que
+# não for número vira vazio.
+def tipo_leitura(tipo):
+    return "str" if tipo == "numero" else tipo
+
+def numero_br(serie):
+    texto = serie.astype("str").str.strip().str.removesuffix("%").str.strip()
+    brasileiro = texto.str.contains(",", regex=False) | texto.str.fullmatch(r"-?\d{1,3}(\.\d{3})+")
+    texto = texto.where(~brasileiro, texto.str.replace(".", "", regex=False).str.replace(",", ".", regex=False))
+    return pd.to_numeric(texto.where(serie.notna()), errors="coerce").astype("float32")
+
+def para_exibir(df):
+    # Convertido direto para float64, o float32 28.14 vira 28.139999389648438:
+    # na saída (tabela, gráfico, arquivo) passa pela representação decimal mais curta
+    colunas = [coluna for coluna in df.columns if df[coluna].dtype == "float32"]
+    if not colunas:
+        return df
+    return df.assign(**{coluna: pd.to_numeric(df[coluna].astype(str)) for coluna in colunas})
+
+def converter_numeros(df, esquema):
+    if esquema is None:
+        return df
+    for coluna, tipo in esquema.tipos.items():
+        if tipo == "numero" and coluna in df.columns:
+            serie = df[coluna]
+            # Já numérica (chegou tipada): só compacta, sem passar pelo texto de novo
+            df[coluna] = serie.astype("float32") if pd.api.types.is_numeric_dtype(serie) else numero_br(serie)
+    return df
+
+# ================== DICIONÁRIOS COMPARTILHADOS DAS CATEGÓRICAS ==================
+# Um dicionário por nome de coluna, só acrescido, compartilhado por todas as
+# abas, versões e sessões do processo. Os códigos de um valor nunca mudam, e
+# um DataFrame filtrado reaproveita as categorias do original.
+class DicionarioCategorias:
+    def __init__(self):
+        self._tipos = {}
+        self._lock = threading.Lock()
+
+    def tipo(self, coluna, valores):
+        with self._lock:
+            atual = self._tipos.get(coluna)
+            conhecidos = atual.categories if atual is not None else pd.Index([])
+            novos = pd.Index(valores).dropna().difference(conhecidos)
+            if atual is None or len(novos):
+                atual = self._tipos[coluna] = pd.CategoricalDtype(conhecidos.append(novos.sort_values()))
+            return atual
+
+dicionarios = DicionarioCategorias()
+
+def compartilhar_categorias(df, esquema):
+    if esquema is None:
+        return df
+    for coluna, tipo in esquema.tipos.items():
+        if tipo == "category" and coluna in df.columns:
+            serie = df[coluna]
+            valores = serie.cat.categories if isinstance(serie.dtype, pd.CategoricalDtype) else serie.unique()
+            df[coluna] = serie.astype(dicionarios.tipo(coluna, valores))
+    return df
+
+def aplicar_dicionarios(df, esquema):
+    # Dicionários do processo (categorias e ids de município): refeitos a cada
+    # leitura, inclusive quando o DataFrame vem do cache compartilhado
+    return atribuir_municipios(compartilhar_categorias(df, esquema), esquema)
+
+def nome_da_aba(sheet_url):
+    consulta = urllib.parse.parse_qs(urllib.parse.urlparse(sheet_url).query)
+    return consulta.get("sheet", [""])[0]
+
+def esquema_da_aba(sheet_url):
+    return ESQUEMAS.get(nome_da_aba(sheet_url))
+
+def verificar_esquema(sheet_url, df):
+    # Colunas que o esquema exige e a planilha deixou de ter (renomeadas ou apagadas)
+    esquema = esquema_da_aba(sheet_url)
+    if esquema is None:
+        return []
+    return sorted(esquema.obrigatorias() - set(df.columns))
+
+def ler_cabecalho(conteudo):
+    texto = io.TextIOWrapper(io.BytesIO(conteudo), encoding="utf-8-sig", newline="")
+    return next(csv.reader(texto), [])
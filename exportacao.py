@@ -0,0 +1,200 @@
+import io
+import json
+import os
+import re
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from catalogo import catalogo, colunas_visiveis
+from dados import CacheLRU, impressao_digital
+from esquemas import para_exibir
+
+try:
+    import openpyxl
+except ImportError:  # sem openpyxl não há exportação XLSX
+    openpyxl = None
+
+try:
+    import pyarrow
+except ImportError:  # sem pyarrow não há exportação Parquet
+    pyarrow = None
+
+# ================== FORMATOS DE EXPORTAÇÃO ==================
+# O arquivo só é gerado quando alguém clica em baixar (o botão recebe uma
+# função, executada fora da thread do script) e fica guardado por versão dos
+# dados, linhas filtradas e formato (e, no XLSX, pelos filtros que ele lista):
+# cliques repetidos não serializam de novo.
+@dataclass(frozen=True)
+class Formato:
+    extensao: str
+    mime: str
+    gerar: object  # (df_filtrado, filtros, catálogo da aba) -> bytes
+    usa_filtros: bool = False  # o arquivo lista os filtros: entram na chave do cache
+
+def _visivel(df):
+    # Sem o id interno de município (com Copy-on-Write a seleção de colunas não
+    # copia os dados) e com os indicadores float32 como aparecem na tela
+    return para_exibir(df[colunas_visiveis(df)])
+
+def _gerar_csv(df, filtros, catalogo_aba):
+    return df.to_csv(index=False).encode('utf-8-sig')
+
+def _gerar_parquet(df, filtros, catalogo_aba):
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, index=False)
+    return buffer.getvalue()
+
+def _gerar_xlsx(df, filtros, catalogo_aba):
+    # Dados filtrados, valores escolhidos nos filtros que restringem algo e o catálogo das colunas da aba
+    filtros = pd.DataFrame(list(filtros), columns=["Filtro", "Valor"])
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="openpyxl") as planilha:
+        df.to_excel(planilha, sheet_name="Dados", index=False)
+        filtros.to_excel(planilha, sheet_name="Filtros", index=False)
+        catalogo_aba.tabela().to_excel(planilha, sheet_name="Colunas", index=False)
+    return buffer.getvalue()
+
+FORMATOS = {
+    "CSV": Formato("csv", "text/csv", _gerar_csv),
+    "Parquet": Formato("parquet", "application/vnd.apache.parquet", _gerar_parquet),
+    "XLSX": Formato(
+        "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", _gerar_xlsx, usa_filtros=True
+    ),
+}
+
+def formatos_disponiveis():
+    nomes = ["CSV"]
+    if pyarrow is not None:
+        nomes.append("Parquet")
+    if openpyxl is not None:
+        nomes.append("XLSX")
+    return nomes
+
+def chave_filtro(posicoes):
+    # As mesmas linhas na mesma ordem dão a mesma chave, qualquer que seja a seleção que as produziu
+    return impressao_digital(np.ascontiguousarray(posicoes, dtype=np.int64).tobytes())
+
+exportacoes = CacheLRU(max_itens=16)
+
+def exportar(entrada, posicoes, filtros, formato):
+    # Devolve a função que o botão de download chama no clique. `filtros`: pares
+    # (coluna, valor) já legíveis e em ordem canônica (ver painel.filtros_aplicados)
+    especificacao = FORMATOS[formato]
+    chave = (entrada.versao, chave_filtro(posicoes), formato, filtros if especificacao.usa_filtros else None)
+
+    def gerar():
+        return exportacoes.obter(
+            chave, lambda: especificacao.gerar(_visivel(entrada.df).iloc[posicoes], filtros, catalogo(entrada))
+        )
+    return gerar
+
+# ================== PACOTE COM TODAS AS ABAS ==================
+# Gerado numa thread própria e gravado direto num arquivo temporário, uma aba
+# por vez: só a aba sendo serializada fica na memória. O arquivo é nomeado
+# pelas versões de todas as abas e reaproveitado enquanto nenhuma mudar.
+FORMATOS_PACOTE = {
+    "ZIP (CSV)": ("zip", "application/zip"),
+    "ZIP (Parquet)": ("zip", "application/zip"),
+    "XLSX": ("xlsx", FORMATOS["XLSX"].mime),
+}
+
+def formatos_pacote_disponiveis():
+    nomes = ["ZIP (CSV)"]
+    if pyarrow is not None:
+        nomes.append("ZIP (Parquet)")
+    if openpyxl is not None:
+        nomes.append("XLSX")
+    return nomes
+
+def _nome_planilha(nome):
+    return re.sub(r"[\[\]:*?/\\]", " ", nome)[:31]
+
+def _gravar_zip(caminho, entradas, formato):
+    with zipfile.ZipFile(caminho, "w", compression=zipfile.ZIP_DEFLATED) as pacote:
+        for nome, entrada in entradas.items():
+            if formato == "ZIP (Parquet)":
+                with pacote.open(f"{nome}.parquet", "w") as destino:
+                    _visivel(entrada.df).to_parquet(destino, index=False)
+            else:
+                with pacote.open(f"{nome}.csv", "w") as destino:
+                    with io.TextIOWrapper(destino, encoding="utf-8-sig", newline="") as texto:
+                        _visivel(entrada.df).to_csv(texto, index=False)
+
+LINHAS_POR_BLOCO = 10_000
+
+def _gravar_xlsx(caminho, entradas):
+    # Workbook write_only: as linhas vão para o arquivo à medida que são
+    # acrescentadas, aba por aba e em blocos, sem as células de todas as abas
+    # na memória como no ExcelWriter
+    livro = openpyxl.Workbook(write_only=True)
+    for nome, entrada in entradas.items():
+        df = _visivel(entrada.df)
+        planilha = livro.create_sheet(_nome_planilha(nome))
+        planilha.append([str(coluna) for coluna in df.columns])
+        for inicio in range(0, len(df), LINHAS_POR_BLOCO):
+            bloco = df.iloc[inicio:inicio + LINHAS_POR_BLOCO].astype(object)
+            for linha in bloco.where(bloco.notna(), None).itertuples(index=False, name=None):
+                planilha.append(linha)
+    livro.save(caminho)
+
+class GeradorPacotes:
+    def __init__(self, pasta=None, max_arquivos=4):
+        self.pasta = pasta or tempfile.mkdtemp(prefix="nrc-pacotes-")
+        self.max_arquivos = max_arquivos
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pacote")
+        self._lock = threading.Lock()
+        self._tarefas = {}
+
+    def iniciar(self, abas, carregar, formato):
+        # Pedidos iguais enquanto um pacote está sendo gerado compartilham a mesma tarefa
+        pedido = (tuple(aba.nome for aba in abas), formato)
+        with self._lock:
+            tarefa = self._tarefas.get(pedido)
+            if tarefa is None or tarefa.done():
+                tarefa = self._tarefas[pedido] = self._executor.submit(self._gerar, abas, carregar, formato)
+            return tarefa
+
+    def _gerar(self, abas, carregar, formato):
+        entradas = {aba.nome: carregar(aba) for aba in abas}
+        versoes = [(nome, entrada.versao) for nome, entrada in entradas.items()]
+        chave = impressao_digital(json.dumps([formato, versoes]).encode())
+        extensao = FORMATOS_PACOTE[formato][0]
+        caminho = os.path.join(self.pasta, f"{chave}.{extensao}")
+        if os.path.exists(caminho):
+            os.utime(caminho)
+            return caminho
+
+        temporario = os.path.join(self.pasta, f"{chave}.tmp.{extensao}")  # o pandas escolhe o escritor pela extensão
+        if formato == "XLSX":
+            _gravar_xlsx(temporario, entradas)
+        else:
+            _gravar_zip(temporario, entradas, formato)
+        os.replace(temporario, caminho)
+        self._limpar()
+        return caminho
+
+    def _limpar(self):
+        # Os pacotes das tarefas guardadas ficam: sessões ainda podem baixá-los
+        with self._lock:
+            em_uso = {
+                tarefa.result() for tarefa in self._tarefas.values()
+                if tarefa.done() and tarefa.exception() is None
+            }
+        arquivos = sorted(
+            (os.path.join(self.pasta, nome) for nome in os.listdir(self.pasta) if ".tmp." not in nome),
+            key=os.path.getmtime,
+        )
+        for caminho in arquivos[:-self.max_arquivos]:
+            if caminho not in em_uso:
+                os.remove(caminho)
+
+@st.cache_resource
+def obter_gerador_pacotes():
+    return GeradorPacotes()
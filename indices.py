@@ -0,0 +1,170 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dados import CacheLRU
+
+# ================== ÍNDICE DE BITMAPS PARA OS FILTROS ==================
+# Para cada coluna de filtro, um bitmap de linhas por valor distinto (bits
+# empacotados: 1 byte para cada 8 linhas). É montado uma vez por versão da
+# aba e filtrar vira união (valores escolhidos na mesma coluna) e interseção
+# (colunas diferentes) de bitmaps, sem varrer as linhas a cada rerun.
+_NULO = object()  # chave das células vazias
+
+def _chave(valor):
+    return _NULO if pd.isna(valor) else valor
+
+class BitmapColuna:
+    def __init__(self, serie):
+        self.linhas = len(serie)
+        if isinstance(serie.dtype, pd.CategoricalDtype):
+            codigos, categorias = serie.cat.codes.to_numpy(), serie.cat.categories
+        else:
+            codigos, categorias = pd.factorize(serie)
+        self.bitmaps = {}
+        ordem = np.argsort(codigos, kind="stable")
+        codigos_ordenados = codigos[ordem]
+        presentes, inicios = np.unique(codigos_ordenados, return_index=True)
+        fins = np.append(inicios[1:], len(codigos_ordenados))
+        for codigo, inicio, fim in zip(presentes, inicios, fins):
+            marcadas = np.zeros(self.linhas, dtype=bool)
+            marcadas[ordem[inicio:fim]] = True
+            chave = _NULO if codigo < 0 else categorias[codigo]
+            self.bitmaps[chave] = np.packbits(marcadas)
+
+    def uniao(self, valores):
+        chaves = {_chave(valor) for valor in valores}
+        if chaves.issuperset(self.bitmaps):
+            return None  # todos os valores escolhidos: a coluna não restringe nada
+        resultado = np.zeros((self.linhas + 7) // 8, dtype=np.uint8)
+        for chave in chaves:
+            bitmap = self.bitmaps.get(chave)
+            if bitmap is not None:
+                resultado |= bitmap
+        return resultado
+
+def bitmap_coluna(entrada, coluna):
+    return entrada.derivado(("bitmap", coluna), lambda: BitmapColuna(entrada.df[coluna]))
+
+def posicoes_filtradas(entrada, selecoes):
+    resultado = None
+    for coluna, valores in selecoes.items():
+        bitmap = bitmap_coluna(entrada, coluna).uniao(valores)
+        if bitmap is None:
+            continue
+        resultado = bitmap if resultado is None else resultado & bitmap
+    if resultado is None:
+        return np.arange(len(entrada.df))
+    return np.flatnonzero(np.unpackbits(resultado, count=len(entrada.df)))
+
+def _ordem_coluna(serie, ascendente):
+    if not isinstance(serie.dtype, pd.CategoricalDtype):
+        return serie.reset_index(drop=True).sort_values(ascending=ascendente, kind="stable").index.to_numpy()
+    # Nos dicionários compartilhados os códigos seguem a ordem de chegada, não a
+    # alfabética: ordena pela posição de cada categoria, vazios sempre no fim
+    posto = np.argsort(np.argsort(serie.cat.categories.to_numpy(), kind="stable")).astype(float)
+    codigos = serie.cat.codes.to_numpy()
+    chave = posto[codigos] if ascendente else -posto[codigos]
+    chave[codigos < 0] = np.inf
+    return np.argsort(chave, kind="stable")
+
+def _ordem(entrada, coluna, ascendente):
+    return entrada.derivado(("ordem", coluna, ascendente), lambda: _ordem_coluna(entrada.df[coluna], ascendente))
+
+def ordenar_posicoes(entrada, posicoes, coluna, ascendente=True):
+    # Ordem completa da coluna calculada uma vez por versão; aqui só se mantém
+    # a parte que sobreviveu aos filtros
+    ordem = _ordem(entrada, coluna, ascendente)
+    marcadas = np.zeros(len(entrada.df), dtype=bool)
+    marcadas[posicoes] = True
+    return ordem[marcadas[ordem]]
+
+def primeiros(entrada, posicoes, coluna, n, ascendente=False):
+    # Os n maiores (ou menores) da seleção, vazios de fora, lidos da ordem já
+    # calculada: "os 10 piores municípios" sem ordenar a aba de novo
+    validos = entrada.derivado(("validos", coluna), lambda: int(entrada.df[coluna].notna().sum()))
+    ordem = _ordem(entrada, coluna, ascendente)[:validos]  # vazios ficam sempre no fim da ordem
+    if len(posicoes) < len(entrada.df):
+        marcadas = np.zeros(len(entrada.df), dtype=bool)
+        marcadas[posicoes] = True
+        ordem = ordem[marcadas[ordem]]
+    return ordem[:n]
+
+# ================== CUBO DE CONTAGENS PARA OS GRÁFICOS ==================
+# Contagem de linhas por combinação de valores das dimensões (município ×
+# esfera × situação, por exemplo), materializada uma vez por versão. Os
+# gráficos fatiam o cubo pelas seleções e somam: o custo depende do número
+# de combinações distintas, não do número de linhas.
+class CuboContagens:
+    def __init__(self, df, dimensoes):
+        self.cubo = (
+            df.groupby(list(dimensoes), observed=True, dropna=False)
+            .size()
+            .rename("Total")
+            .reset_index()
+        )
+
+    def contar(self, dimensao, selecoes):
+        fatia = self.cubo
+        for coluna, valores in selecoes.items():
+            fatia = fatia[fatia[coluna].isin(valores)]
+        contagem = fatia.groupby(dimensao, observed=True)["Total"].sum()
+        return contagem[contagem > 0].sort_values(ascending=False)
+
+def contar(entrada, dimensao, selecoes):
+    # Equivalente a entrada.df.iloc[posicoes_filtradas(entrada, selecoes)][dimensao].value_counts()
+    dimensoes = tuple(dict.fromkeys([*selecoes, dimensao]))
+    cubo = entrada.derivado(("cubo", dimensoes), lambda: CuboContagens(entrada.df, dimensoes))
+    return cubo.contar(dimensao, selecoes)
+
+def principais(contagem, limite, rotulo_outros):
+    # Cauda longa somada numa fatia só: o gráfico leva no máximo limite + 1 marcas
+    if len(contagem) <= limite + 1:
+        return contagem
+    topo = contagem.iloc[:limite]
+    topo.index = topo.index.astype(str)
+    return pd.concat([topo, pd.Series([contagem.iloc[limite:].sum()], index=[rotulo_outros])])
+
+# ================== RESULTADOS POR SELEÇÃO ==================
+# A mesma fatia (todas as unidades de uma ESFERA, os registros de um
+# município...) é pedida por vários fiscais. O resultado de cada seleção fica
+# num LRU do processo, chaveado pela versão da aba e pela forma canônica da
+# seleção, com as posições filtradas e o que for derivado delas (contagens,
+# especificações de gráficos).
+class ResultadoFiltro:
+    def __init__(self, posicoes):
+        self.posicoes = posicoes
+        self._derivados = {}
+        self._lock = threading.Lock()
+
+    def derivado(self, nome, calcular):
+        with self._lock:
+            if nome not in self._derivados:
+                self._derivados[nome] = calcular()
+            return self._derivados[nome]
+
+resultados = CacheLRU(max_itens=256)
+
+def selecao_canonica(entrada, selecoes):
+    # Ordem dos valores e das colunas não importa; coluna com tudo marcado não restringe nada
+    canonica = []
+    for coluna, valores in sorted(selecoes.items()):
+        chaves = {_chave(valor) for valor in valores}
+        if chaves.issuperset(bitmap_coluna(entrada, coluna).bitmaps):
+            continue
+        valores_canonicos = sorted(str(chave) for chave in chaves if chave is not _NULO)
+        if _NULO in chaves:
+            valores_canonicos.append(None)
+        canonica.append((coluna, tuple(valores_canonicos)))
+    return tuple(canonica)
+
+def resultado_filtro(entrada, selecoes, ordem=None):
+    chave = (entrada.versao, selecao_canonica(entrada, selecoes), ordem)
+
+    def calcular():
+        posicoes = posicoes_filtradas(entrada, selecoes)
+        if ordem is not None:
+            posicoes = ordenar_posicoes(entrada, posicoes, *ordem)
+        return ResultadoFiltro(posicoes)
+    return resultados.obter(chave, calcular)
@@ -0,0 +1,68 @@
+import re
+import threading
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+# ================== DIMENSÃO DE MUNICÍPIOS ==================
+# Cada aba chama a coluna de município de um jeito (MUNICÍPIOS, MUNICÍPIO,
+# CIDADE, Nome Município...) e escreve os nomes com acentuação e caixa
+# diferentes. Na leitura, o nome é normalizado (sem acento, caixa única,
+# espaços simples) e ganha um id inteiro, igual em todas as abas: filtros e
+# junções entre abas comparam inteiros, não textos.
+COLUNA_ID = "ID_MUNICIPIO"
+
+def normalizar_nome(nome):
+    decomposto = unicodedata.normalize("NFKD", str(nome))
+    sem_acento = "".join(caractere for caractere in decomposto if not unicodedata.combining(caractere))
+    return re.sub(r"\s+", " ", sem_acento).strip().casefold()
+
+class DimensaoMunicipios:
+    # Só acrescida: os ids valem para o processo inteiro e não mudam. Não vão
+    # para o cache compartilhado; cada processo refaz a atribuição ao ler.
+    def __init__(self):
+        self._ids = {}  # nome normalizado -> id
+        self._chaves = [None]  # id -> nome normalizado (ids começam em 1)
+        self._lock = threading.Lock()
+
+    def ids(self, nomes):
+        resultado = np.zeros(len(nomes), dtype=np.int32)
+        with self._lock:
+            for posicao, nome in enumerate(nomes):
+                if pd.isna(nome):
+                    continue
+                chave = normalizar_nome(nome)
+                if not chave:
+                    continue
+                if chave not in self._ids:
+                    self._ids[chave] = len(self._chaves)
+                    self._chaves.append(chave)
+                resultado[posicao] = self._ids[chave]
+        return resultado
+
+    def chave(self, id_municipio):
+        return self._chaves[id_municipio]
+
+dimensao = DimensaoMunicipios()
+
+def atribuir_municipios(df, esquema):
+    if esquema is None or esquema.col_municipio not in df.columns:
+        return df
+    serie = df[esquema.col_municipio]
+    # Normaliza só os valores distintos e espalha pelos códigos
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        codigos, distintos = serie.cat.codes.to_numpy(), serie.cat.categories
+    else:
+        codigos, distintos = pd.factorize(serie)
+    ids = np.append(dimensao.ids(list(distintos)), np.int32(0))[codigos]  # código -1 (vazio) cai no 0
+    df[COLUNA_ID] = pd.arrays.IntegerArray(ids, ids == 0)
+    return df
+
+def nomes_na_aba(entrada, coluna):
+    # Rótulo de cada id com a grafia da própria aba (a primeira linha em que
+    # aparece). A da dimensão é a da primeira aba lida, que varia entre processos
+    return entrada.derivado(
+        ("nomes_municipios", coluna),
+        lambda: entrada.df.groupby(COLUNA_ID)[coluna].first().astype(str).to_dict(),
+    )
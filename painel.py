@@ -0,0 +1,480 @@
+import os
+import time
+import traceback
+import urllib.parse
+from dataclasses import dataclass
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from catalogo import catalogo, colunas_visiveis
+from dados import formatar_idade, obter_cache_abas, obter_precarregador
+from esquemas import esquema_da_aba, para_exibir, verificar_esquema
+from exportacao import (
+    FORMATOS,
+    FORMATOS_PACOTE,
+    exportar,
+    formatos_disponiveis,
+    formatos_pacote_disponiveis,
+    obter_gerador_pacotes,
+)
+from indices import contar, ordenar_posicoes, primeiros, principais, resultado_filtro, selecao_canonica
+from municipios import COLUNA_ID, dimensao, nomes_na_aba
+
+# ================== DEFINIÇÃO DAS ABAS ==================
+# Cada painel descreve suas abas como dados; o motor abaixo cuida de carregar,
+# indexar, filtrar, agregar e exportar do mesmo jeito para todas elas.
+@dataclass(frozen=True)
+class Filtro:
+    coluna: str
+    rotulo: str
+
+@dataclass(frozen=True)
+class Grafico:
+    tipo: str  # "pizza" e "barras" contam linhas por `coluna`; "ranking" mostra os maiores `valor`
+    # Só os `limite` maiores viram marcas; em pizza e barras o resto é somado em "Outros"
+    coluna: str
+    rotulo: str
+    titulo: str
+    valor: str = None
+    rotulo_valor: str = None
+    limite: int = 10
+    cor: str = "#1f77b4"
+
+@dataclass(frozen=True)
+class Aba:
+    nome: str  # como aparece na seleção de abas
+    titulo: str
+    url: str
+    arquivo: str  # nome do arquivo baixado (a extensão segue o formato escolhido)
+    filtros: tuple = ()
+    graficos: tuple = ()
+    consulta: dict = None  # colunas pedidas ao gviz, {"colunas": [...]} (ver dados.montar_consulta)
+    ordem: tuple = None  # (coluna, ascendente)
+    fonte: object = None  # () -> EntradaCache, para abas montadas a partir de outras (ver visao360)
+
+    @property
+    def coluna_chave(self):
+        esquema = esquema_da_aba(self.url)
+        return esquema.col_municipio if esquema is not None else None
+
+def url_aba(sheet_id, nome_aba):
+    return (
+        f"https://docs.google.com/spreadsheets/d/{sheet_id}/gviz/tq?tqx=out:csv"
+        f"&sheet={urllib.parse.quote(nome_aba)}"
+    )
+
+# ================== TEXTOS ==================
+TEXTOS_PT = {
+    "selecao_aba": "📂 Seleção de Aba",
+    "selecione_aba": "Selecione uma aba:",
+    "precarregando": "⏳ Pré-carregando: ",
+    "carregando": "Carregando dados de {aba}...",
+    "erro_carga": "Erro ao carregar dados: {erro}",
+    "sem_dados": "Não foi possível carregar os dados da aba {aba}.",
+    "obtidos_em": "Dados obtidos em {data} (há {idade})",
+    "atualizando": " · 🔄 atualizando em segundo plano",
+    "fora_do_esquema": "⚠️ A aba {aba} mudou de formato na planilha. Coluna(s) esperada(s) ausente(s): {colunas}",
+    "fonte_ignorada": "⚠️ A aba {aba} ficou de fora desta visão: mudou de formato na planilha. Coluna(s) esperada(s) ausente(s): {colunas}",
+    "total_registros": "Total de registros",
+    "colunas_disponiveis": "Colunas disponíveis",
+    "ultima_atualizacao": "Última atualização",
+    "selecionados": "### 📌 {total} Registros Selecionados",
+    "baixar": "📥 Baixar Dados",
+    "formato": "Formato do arquivo",
+    "aplicar_filtros": "Aplicar filtros",
+    "tempo_aba": "⏱️ Aba atualizada em {ms:.0f} ms",
+    "outros": "Outros",
+    "colunas": "Colunas",
+    "ordenar_por": "Ordenar por",
+    "sem_ordenacao": "(ordem padrão)",
+    "sentido": "Sentido",
+    "crescente": "Crescente",
+    "decrescente": "Decrescente",
+    "por_pagina": "Linhas por página",
+    "pagina": "Página",
+    "linhas": "Linhas {inicio}–{fim} de {total} · página {pagina} de {paginas}",
+    "erro_aba": "Erro ao processar a aba {aba}: {erro}",
+    "pacote": "📦 Todas as abas",
+    "pacote_formato": "Formato do pacote",
+    "pacote_preparar": "Preparar pacote",
+    "pacote_preparando": "⏳ Preparando o pacote com todas as abas...",
+    "pacote_baixar": "📥 Baixar todas as abas",
+    "pacote_erro": "Erro ao preparar o pacote: {erro}",
+}
+
+TEXTOS_EN = {
+    "selecao_aba": "📂 Tab Selection",
+    "selecione_aba": "Select a tab:",
+    "precarregando": "⏳ Prefetching: ",
+    "carregando": "Loading data from {aba}...",
+    "erro_carga": "Error loading data: {erro}",
+    "sem_dados": "Could not load data from tab {aba}.",
+    "obtidos_em": "Data fetched on {data} ({idade} ago)",
+    "atualizando": " · 🔄 refreshing in the background",
+    "fora_do_esquema": "⚠️ Tab {aba} changed format in the spreadsheet. Expected column(s) missing: {colunas}",
+    "fonte_ignorada": "⚠️ Tab {aba} was left out of this view: it changed format in the spreadsheet. Expected column(s) missing: {colunas}",
+    "total_registros": "Total records",
+    "colunas_disponiveis": "Available columns",
+    "ultima_atualizacao": "Last update",
+    "selecionados": "### 📌 {total} Selected Records",
+    "baixar": "📥 Download Data",
+    "formato": "File format",
+    "aplicar_filtros": "Apply filters",
+    "tempo_aba": "⏱️ Tab updated in {ms:.0f} ms",
+    "outros": "Others",
+    "colunas": "Columns",
+    "ordenar_por": "Sort by",
+    "sem_ordenacao": "(default order)",
+    "sentido": "Direction",
+    "crescente": "Ascending",
+    "decrescente": "Descending",
+    "por_pagina": "Rows per page",
+    "pagina": "Page",
+    "linhas": "Rows {inicio}–{fim} of {total} · page {pagina} of {paginas}",
+    "erro_aba": "Error processing {aba} tab: {erro}",
+    "pacote": "📦 All tabs",
+    "pacote_formato": "Bundle format",
+    "pacote_preparar": "Prepare bundle",
+    "pacote_preparando": "⏳ Preparing the bundle with all tabs...",
+    "pacote_baixar": "📥 Download all tabs",
+    "pacote_erro": "Error preparing the bundle: {erro}",
+}
+
+# ================== ESTADO NA URL ==================
+# A aba e os filtros ficam na query string (?aba=...&f.ESFERA=...): um link
+# compartilhado abre a mesma fatia e cai no mesmo resultado em cache.
+PREFIXO_FILTRO = "f."
+VAZIO = "(vazio)"  # células vazias; um parâmetro em branco é uma seleção vazia
+
+def _token(coluna, valor):
+    if pd.isna(valor):
+        return VAZIO
+    # Município vai pelo nome normalizado: os ids inteiros só valem dentro do processo
+    return dimensao.chave(valor) if coluna == COLUNA_ID else str(valor)
+
+def _rotulo(coluna, valor, nomes):
+    if coluna == COLUNA_ID and not pd.isna(valor):
+        return nomes[valor]
+    return _token(coluna, valor)
+
+def coluna_interna(aba, coluna):
+    # Filtros e contagens por município usam os ids da dimensão de municípios,
+    # não os nomes: grafias diferentes do mesmo município caem juntas
+    return COLUNA_ID if coluna == aba.coluna_chave else coluna
+
+def filtro_da_url(aba, filtro, valores):
+    tokens = st.query_params.get_all(PREFIXO_FILTRO + filtro.coluna)
+    if not tokens:
+        return list(valores)
+    coluna = coluna_interna(aba, filtro.coluna)
+    return [valor for valor in valores if _token(coluna, valor) in set(tokens)]
+
+def gravar_filtros_na_url(entrada, aba, selecoes):
+    restritas = dict(selecao_canonica(entrada, selecoes))
+    for filtro in aba.filtros:
+        chave = PREFIXO_FILTRO + filtro.coluna
+        coluna = coluna_interna(aba, filtro.coluna)
+        if coluna in restritas:
+            tokens = sorted({_token(coluna, valor) for valor in selecoes[coluna]}) or [""]
+            if st.query_params.get_all(chave) != tokens:
+                st.query_params[chave] = tokens
+        elif chave in st.query_params:
+            del st.query_params[chave]
+
+def filtros_aplicados(entrada, aba, selecoes):
+    # Filtros que restringem algo, como pares (coluna, valor) legíveis e em ordem
+    # canônica: seleções equivalentes dão a mesma tupla
+    restritas = dict(selecao_canonica(entrada, selecoes))
+    pares = []
+    for filtro in aba.filtros:
+        coluna = coluna_interna(aba, filtro.coluna)
+        if coluna in restritas:
+            nomes = nomes_na_aba(entrada, filtro.coluna) if coluna == COLUNA_ID else None
+            rotulos = sorted({_rotulo(coluna, valor, nomes) for valor in selecoes[coluna]})
+            pares.extend((filtro.coluna, rotulo) for rotulo in rotulos)
+    return tuple(pares)
+
+# ================== BARRA LATERAL ==================
+def selecionar_aba(abas, textos=TEXTOS_PT):
+    st.sidebar.header(textos["selecao_aba"])
+    por_nome = {aba.nome: aba for aba in abas}
+    pedida = st.query_params.get("aba")
+    nomes = list(por_nome)
+    if "aba_selecionada" not in st.session_state:
+        # A URL só decide a aba inicial; depois vale o que a sessão escolheu (um
+        # `index` que muda a cada troca recriaria o widget e perderia a escolha)
+        st.session_state.aba_selecionada = pedida if pedida in nomes else nomes[0]
+    aba = por_nome[st.sidebar.radio(textos["selecione_aba"], nomes, key="aba_selecionada")]
+    if pedida != aba.nome:
+        # Outra aba: os filtros da anterior não valem mais
+        for chave in [chave for chave in st.query_params if chave.startswith(PREFIXO_FILTRO)]:
+            del st.query_params[chave]
+        st.query_params["aba"] = aba.nome
+
+    # Pré-carrega as demais abas uma vez por sessão
+    cache_abas = obter_cache_abas()
+    precarregador = obter_precarregador()
+    if "precarga_iniciada" not in st.session_state:
+        st.session_state.precarga_iniciada = True
+        precarregador.iniciar(
+            {nome: item.url for nome, item in por_nome.items() if item.fonte is None},
+            cache_abas.obter,
+            cache_abas.carregar_lote,
+            {nome: item.consulta for nome, item in por_nome.items() if item.consulta},
+        )
+
+    abas_pendentes = precarregador.pendentes()
+    if abas_pendentes:
+        st.sidebar.caption(textos["precarregando"] + ", ".join(abas_pendentes))
+
+    with st.sidebar.expander(textos["pacote"]):
+        pacote_todas_as_abas(abas, textos)
+    return aba
+
+def pacote_todas_as_abas(abas, textos=TEXTOS_PT):
+    formato = st.selectbox(textos["pacote_formato"], formatos_pacote_disponiveis())
+    if st.button(textos["pacote_preparar"]):
+        tarefa = obter_gerador_pacotes().iniciar(abas, obter_entrada, formato)
+        st.session_state.pacote = (formato, tarefa)
+
+    if "pacote" not in st.session_state:
+        return
+    formato, tarefa = st.session_state.pacote
+    if not tarefa.done():
+        _aguardar_pacote(tarefa, textos)
+    elif tarefa.exception() is not None:
+        st.error(textos["pacote_erro"].format(erro=tarefa.exception()))
+    else:
+        caminho = tarefa.result()
+        gerador = obter_gerador_pacotes()
+        extensao, mime = FORMATOS_PACOTE[formato]
+        st.download_button(
+            label=textos["pacote_baixar"],
+            data=lambda: _abrir_pacote(caminho, gerador, abas, formato),
+            file_name=f"todas_as_abas.{extensao}",
+            mime=mime,
+            on_click="ignore"
+        )
+
+def _abrir_pacote(caminho, gerador, abas, formato):
+    # O gerador apaga pacotes antigos: se este sumiu entre a tela e o clique, é gerado de novo
+    try:
+        return open(caminho, "rb")
+    except FileNotFoundError:
+        return open(gerador.iniciar(abas, obter_entrada, formato).result(), "rb")
+
+@st.fragment(run_every=2)
+def _aguardar_pacote(tarefa, textos):
+    # Enquanto o pacote é montado em segundo plano, só este trecho é reexecutado
+    if tarefa.done():
+        st.rerun()
+    st.caption(textos["pacote_preparando"])
+
+# ================== MOTOR DAS ABAS ==================
+MOSTRAR_TEMPOS = os.environ.get("NRC_MOSTRAR_TEMPOS") == "1"  # diagnóstico: tempo de cada execução da aba
+
+def obter_entrada(aba):
+    if aba.fonte is not None:
+        return aba.fonte()
+    return obter_cache_abas().obter(aba.url, aba.consulta)
+
+def carregar_aba(aba, textos=TEXTOS_PT):
+    try:
+        return obter_entrada(aba)
+    except Exception as e:
+        st.error(textos["erro_carga"].format(erro=str(e)))
+        st.error(traceback.format_exc())
+        return None
+
+def resumo_dados(catalogo_aba, total, textos=TEXTOS_PT):
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(textos["total_registros"], total)
+    with col2:
+        st.metric(textos["colunas_disponiveis"], len(catalogo_aba.colunas))
+    with col3:
+        st.metric(textos["ultima_atualizacao"], catalogo_aba.data_obtencao().strftime("%d/%m/%Y"))
+
+def botao_download(entrada, posicoes, filtros, arquivo, textos=TEXTOS_PT):
+    # O arquivo é gerado só no clique, fora da thread do script (ver exportacao.py)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        formato = st.selectbox(textos["formato"], formatos_disponiveis(), label_visibility="collapsed")
+    with col2:
+        return st.download_button(
+            label=textos["baixar"],
+            data=exportar(entrada, posicoes, filtros, formato),
+            file_name=f"{os.path.splitext(arquivo)[0]}.{FORMATOS[formato].extensao}",
+            mime=FORMATOS[formato].mime,
+            on_click="ignore"
+        )
+
+TAMANHOS_PAGINA = [50, 100, 500, 1000]
+
+def tabela_paginada(entrada, posicoes, aba, textos=TEXTOS_PT):
+    # Ordenação, colunas e recorte da página são resolvidos aqui no servidor:
+    # o navegador recebe só as linhas visíveis
+    df = entrada.df
+    nomes_colunas = list(catalogo(entrada).colunas)
+    chave = f"tabela_{aba.nome}"
+    col1, col2, col3, col4 = st.columns([3, 2, 1, 1])
+    with col1:
+        colunas = st.multiselect(textos["colunas"], nomes_colunas, default=nomes_colunas, key=f"{chave}_colunas")
+    with col2:
+        opcoes = [None, *nomes_colunas]
+        padrao = opcoes.index(aba.ordem[0]) if aba.ordem is not None else 0
+        ordenar_por = st.selectbox(
+            textos["ordenar_por"], opcoes, index=padrao, key=f"{chave}_ordem",
+            format_func=lambda coluna: textos["sem_ordenacao"] if coluna is None else coluna,
+        )
+    with col3:
+        ascendente = st.selectbox(
+            textos["sentido"], [True, False], index=1 if aba.ordem is not None and not aba.ordem[1] else 0,
+            key=f"{chave}_sentido", format_func=lambda valor: textos["crescente" if valor else "decrescente"],
+        )
+    with col4:
+        por_pagina = st.selectbox(textos["por_pagina"], TAMANHOS_PAGINA, key=f"{chave}_tamanho")
+
+    if ordenar_por is not None:
+        posicoes = ordenar_posicoes(entrada, posicoes, ordenar_por, ascendente)
+
+    total_paginas = max(1, -(-len(posicoes) // por_pagina))
+    chave_pagina = f"{chave}_pagina"
+    if st.session_state.get(chave_pagina, 1) > total_paginas:  # filtros mais restritos encolheram a tabela
+        st.session_state[chave_pagina] = total_paginas
+    pagina = st.number_input(textos["pagina"], min_value=1, max_value=total_paginas, step=1, key=chave_pagina)
+
+    inicio = (pagina - 1) * por_pagina
+    visiveis = posicoes[inicio:inicio + por_pagina]
+    st.dataframe(para_exibir(df.iloc[visiveis][colunas]), use_container_width=True)
+    st.caption(textos["linhas"].format(
+        inicio=inicio + 1 if len(visiveis) else 0, fim=inicio + len(visiveis),
+        total=len(posicoes), pagina=pagina, paginas=total_paginas,
+    ))
+
+def especificacao_grafico(grafico, aba, entrada, selecoes, posicoes, rotulo_outros):
+    # Agregado aqui no servidor: a especificação leva só a tabela do gráfico,
+    # nunca as linhas da aba
+    if grafico.tipo == "ranking":
+        maiores = primeiros(entrada, posicoes, grafico.valor, grafico.limite)
+        dados = para_exibir(entrada.df.iloc[maiores][[grafico.coluna, grafico.valor]])
+        if dados.empty:
+            return None
+        chart = alt.Chart(dados).mark_bar().encode(
+            x=alt.X(f"{grafico.valor}:Q", title=grafico.rotulo_valor or grafico.valor),
+            y=alt.Y(f"{grafico.coluna}:N", sort='-x'),
+            color=alt.value(grafico.cor),
+            tooltip=[grafico.coluna, grafico.valor]
+        )
+    else:
+        coluna = coluna_interna(aba, grafico.coluna)
+        contagem = contar(entrada, coluna, selecoes)
+        if coluna == COLUNA_ID:
+            contagem.index = contagem.index.map(nomes_na_aba(entrada, grafico.coluna))
+        dados = principais(contagem, grafico.limite, rotulo_outros).reset_index()
+        dados.columns = [grafico.rotulo, 'Total']
+        if dados.empty:
+            return None
+        if grafico.tipo == "pizza":
+            chart = alt.Chart(dados).mark_arc().encode(
+                theta=alt.Theta(field="Total", type="quantitative"),
+                color=alt.Color(field=grafico.rotulo, type="nominal"),
+                tooltip=[grafico.rotulo, 'Total']
+            )
+        else:
+            chart = alt.Chart(dados).mark_bar().encode(
+                x=alt.X(f"{grafico.rotulo}:N", sort=None),  # já em ordem decrescente, "Outros" no fim
+                y=alt.Y('Total:Q'),
+                color=alt.value(grafico.cor),
+                tooltip=[grafico.rotulo, 'Total']
+            )
+        chart = chart.properties(height=300)
+    return chart.properties(title=grafico.titulo).to_dict()
+
+def desenhar_grafico(grafico, aba, entrada, selecoes, resultado, textos=TEXTOS_PT):
+    # A especificação Vega-Lite (com os dados agregados) fica junto do resultado da seleção
+    especificacao = resultado.derivado(
+        ("grafico", grafico, textos["outros"]),
+        lambda: especificacao_grafico(grafico, aba, entrada, selecoes, resultado.posicoes, textos["outros"]),
+    )
+    if especificacao is not None:
+        st.vega_lite_chart(especificacao, use_container_width=True)
+
+def renderizar_aba(aba, aviso_atualizacao, textos=TEXTOS_PT):
+    with st.spinner(textos["carregando"].format(aba=aba.nome)):
+        entrada = carregar_aba(aba, textos)
+
+    for fonte, colunas_ausentes in (entrada.avisos if entrada is not None else []):
+        st.warning(textos["fonte_ignorada"].format(aba=fonte, colunas=', '.join(colunas_ausentes)))
+
+    if entrada is None or entrada.df.empty:
+        st.error(textos["sem_dados"].format(aba=aba.nome))
+        st.stop()
+
+    df = entrada.df
+    legenda = textos["obtidos_em"].format(
+        data=entrada.data_obtencao().strftime('%d/%m/%Y %H:%M:%S'),
+        idade=formatar_idade(entrada.idade()),
+    )
+    if entrada.atualizando:
+        legenda += textos["atualizando"]
+    aviso_atualizacao.caption(legenda)
+
+    # Planilha fora do esquema: avisa e mostra os dados crus em vez de quebrar a aba
+    colunas_ausentes = verificar_esquema(aba.url, df)
+    if colunas_ausentes:
+        st.warning(textos["fora_do_esquema"].format(aba=aba.nome, colunas=', '.join(colunas_ausentes)))
+        st.dataframe(df[colunas_visiveis(df)], use_container_width=True)
+        st.stop()
+
+    st.header(aba.titulo)
+    corpo_aba(aba, textos)
+
+@st.fragment
+def corpo_aba(aba, textos=TEXTOS_PT):
+    # Filtros, tabela, gráficos e exportação da aba: mudar um filtro ou trocar de
+    # página reexecuta só este trecho, não o script inteiro (login, cabeçalho,
+    # carga das planilhas etc.)
+    inicio = time.perf_counter()
+    try:
+        entrada = obter_entrada(aba)  # já carregada: só consulta a memória
+        catalogo_aba = catalogo(entrada)
+        selecoes = {}
+        if aba.filtros:
+            # Agrupados num formulário: os filtros só valem ao clicar em aplicar
+            with st.form(f"filtros_{aba.nome}"):
+                for coluna, filtro in zip(st.columns(len(aba.filtros)), aba.filtros):
+                    metadados = catalogo_aba.coluna(coluna_interna(aba, filtro.coluna))
+                    nomes = nomes_na_aba(entrada, filtro.coluna) if metadados.nome == COLUNA_ID else None
+                    with coluna:
+                        selecoes[metadados.nome] = st.multiselect(
+                            filtro.rotulo, metadados.valores,
+                            default=filtro_da_url(aba, filtro, metadados.valores),
+                            format_func=lambda valor, metadados=metadados, nomes=nomes: (
+                                f"{_rotulo(metadados.nome, valor, nomes)} ({metadados.contagem(valor)})"
+                            ),
+                        )
+                st.form_submit_button(textos["aplicar_filtros"])
+
+        resultado = resultado_filtro(entrada, selecoes, aba.ordem)
+        gravar_filtros_na_url(entrada, aba, selecoes)
+        posicoes = resultado.posicoes
+
+        resumo_dados(catalogo_aba, len(posicoes), textos)
+        st.write(textos["selecionados"].format(total=len(posicoes)))
+        tabela_paginada(entrada, posicoes, aba, textos)
+
+        if aba.graficos:
+            for coluna, grafico in zip(st.columns(len(aba.graficos)), aba.graficos):
+                with coluna:
+                    desenhar_grafico(grafico, aba, entrada, selecoes, resultado, textos)
+
+        botao_download(entrada, posicoes, filtros_aplicados(entrada, aba, selecoes), aba.arquivo, textos)
+
+    except Exception as e:
+        st.error(textos["erro_aba"].format(aba=aba.nome, erro=str(e)))
+        st.error(traceback.format_exc())
+    if MOSTRAR_TEMPOS:
+        st.caption(textos["tempo_aba"].format(ms=(time.perf_counter() - inicio) * 1000))
@@ -0,0 +1,45 @@
+import csv
+import io
+
+import pandas as pd
+
+import dados
+
+URL = "https://docs.google.com/spreadsheets/d/PLANILHA/gviz/tq?tqx=out:csv&sheet=subregistro"
+
+# A mesma aba como a API devolve (células vazias no fim cortadas) e como o gviz exporta
+LINHAS = [
+    ["Nome Município", "Sub-registro IBGE(1)", "Obs"],
+    ["Caxias", "28,14%"],
+    ["Codó", "12.345", "revisar"],
+    ["São Luís", "12.34"],
+    ["Bacabal", ""],
+]
+CSV_GVIZ = (
+    '"Nome Município","Sub-registro IBGE(1)","Obs",""\n'
+    '"Caxias","28,14%","",""\n'
+    '"Codó","12.345","revisar",""\n'
+    '"São Luís","12.34","",""\n'
+    '"Bacabal","","",""\n'
+).encode("utf-8")
+
+class PlanilhaFalsa:
+    def values_batch_get(self, intervalos, params=None):
+        return {"valueRanges": [{"values": LINHAS} for _ in intervalos]}
+
+class ClienteFalso:
+    def open_by_key(self, planilha_id):
+        return PlanilhaFalsa()
+
+def test_lote_e_gviz_dao_mesma_tabela_e_versao(tmp_path, monkeypatch):
+    monkeypatch.setattr(dados, "armazenamento", dados.BackendDisco(str(tmp_path)))
+    cache = dados.CacheAbas(carregador_lote=dados.CarregadorGspread(ClienteFalso()))
+    assert cache.carregar_lote({"subregistro": URL}) == {URL}
+    pelo_lote = cache.obter(URL)
+
+    esquema = dados.esquema_da_aba(URL)
+    pelo_gviz = dados.interpretar_csv(CSV_GVIZ, esquema)
+    versao_gviz = dados.versao_de_linhas(csv.reader(io.StringIO(CSV_GVIZ.decode("utf-8-sig"))))
+
+    pd.testing.assert_frame_equal(pelo_lote.df, pelo_gviz)
+    assert pelo_lote.versao == versao_gviz
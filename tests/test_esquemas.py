@@ -0,0 +1,21 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from esquemas import ESQUEMAS, converter_numeros, numero_br
+
+def test_numero_br_formato_brasileiro():
+    resultado = numero_br(pd.Series(["28,14%", "12.345", "12.34", None, "1.234,5", " 7 ", "abc"]))
+    assert resultado.dtype == np.float32
+    assert resultado[:3].tolist() == pytest.approx([28.14, 12345.0, 12.34])
+    assert np.isnan(resultado[3])
+    assert resultado[4] == pytest.approx(1234.5)
+    assert resultado[5] == 7.0
+    assert np.isnan(resultado[6])
+
+def test_converter_numeros_nao_reinterpreta_coluna_numerica():
+    df = pd.DataFrame({"Sub-registro IBGE(1)": [12.345, 28.14, np.nan]})
+    resultado = converter_numeros(df, ESQUEMAS["subregistro"])["Sub-registro IBGE(1)"]
+    assert resultado.dtype == np.float32
+    assert resultado[:2].tolist() == pytest.approx([12.345, 28.14])
+    assert np.isnan(resultado[2])
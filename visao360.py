@@ -0,0 +1,112 @@
+import json
+import time
+
+import pandas as pd
+
+from dados import CacheLRU, EntradaCache, impressao_digital, obter_cache_abas
+from esquemas import nome_da_aba, verificar_esquema
+from municipios import COLUNA_ID, nomes_na_aba, normalizar_nome
+from painel import Aba, Filtro
+
+# ================== VISÃO 360 DO MUNICÍPIO ==================
+# Uma linha por município com o que cada aba diz sobre ele (unidades
+# interligadas, formulário do Prov 07, TCT do Prov 09, reativação,
+# sub-registro...). Cada aba vira um resumo indexado por ID_MUNICIPIO,
+# calculado uma vez por versão dela; a visão é a junção desses resumos pelo
+# id (junção por hash no índice inteiro), guardada pelas versões de todas as
+# fontes. Quando uma planilha muda, só o resumo dela é refeito; uma aba fora
+# do esquema fica de fora da visão, com aviso, sem derrubar as demais.
+def _valores(serie):
+    return " / ".join(sorted(serie.dropna().astype(str).unique()))
+
+def _presenca(df, coluna):
+    ids = df[COLUNA_ID].dropna().unique()
+    return pd.DataFrame({coluna: True}, index=pd.Index(ids, name=COLUNA_ID))
+
+# Por nome da aba na planilha (o mesmo de ESQUEMAS): df -> DataFrame indexado por ID_MUNICIPIO
+RESUMOS = {
+    "UNIDADES INTERLIGADAS": lambda df: df.groupby(COLUNA_ID).agg(**{
+        "Unidades interligadas": (COLUNA_ID, "size"),
+        "Situação das unidades": ("SITUAÇÃO GERAL", _valores),
+    }),
+    "STATUS RECEB FORMULARIO": lambda df: df.groupby(COLUNA_ID).agg(**{
+        "Formulário Prov 07": ("STATUS GERAL RECEBIMENTO", _valores),
+    }),
+    "MUNICIPIOS PARA INSTALAR": lambda df: _presenca(df, "Unidade a instalar"),
+    "PROVIMENTO 09": lambda df: _presenca(df, "Assinou TCT (Prov 09)"),
+    "MUNICÍPIOS PARA REATIVA": lambda df: df.groupby(COLUNA_ID).agg(**{
+        "Reativação": ("SITUAÇÃO", _valores),
+    }),
+    "TAB ACOMPANHAMENTO ARTICULAÇÃO": lambda df: df.groupby(COLUNA_ID).agg(**{
+        "Articulação": ("SITUAÇÃO", _valores),
+    }),
+    # O esquema desta aba só garante a coluna de município: registra se o município consta nela
+    "ÍNDICES DE SUB-REGISTRO": lambda df: _presenca(df, "Nos índices de sub-registro"),
+    "subregistro": lambda df: df.groupby(COLUNA_ID).agg(**{
+        "Sub-registro IBGE": ("Sub-registro IBGE(1)", "first"),
+    }),
+}
+
+class Visao360:
+    def __init__(self, max_itens=4):
+        self._visoes = CacheLRU(max_itens=max_itens)
+
+    def obter(self, abas, carregar):
+        fontes = [(aba, carregar(aba.url, aba.consulta)) for aba in abas]
+        versoes = tuple((aba.nome, entrada.versao) for aba, entrada in fontes)
+        visao = self._visoes.obter(versoes, lambda: self._montar(fontes, versoes))
+        # Mesma visão enquanto as versões não mudam; data e aviso de atualização seguem as fontes
+        visao.confirmar(min(entrada.obtido_em for _, entrada in fontes))
+        visao.atualizando = any(entrada.atualizando for _, entrada in fontes)
+        return visao
+
+    @staticmethod
+    def _montar(fontes, versoes):
+        versao = impressao_digital(json.dumps(versoes).encode())
+        avisos = []
+        validas = []
+        for aba, entrada in fontes:
+            colunas_ausentes = verificar_esquema(aba.url, entrada.df)
+            if colunas_ausentes:
+                avisos.append((aba.nome, colunas_ausentes))
+            else:
+                validas.append((aba, entrada))
+        if not validas:
+            return EntradaCache(pd.DataFrame(), time.time(), versao, avisos=avisos)
+        resumos = [
+            entrada.derivado(("resumo360", nome_da_aba(aba.url)), lambda aba=aba, entrada=entrada: RESUMOS[nome_da_aba(aba.url)](entrada.df))
+            for aba, entrada in validas
+        ]
+        tabela = pd.concat(resumos, axis=1, join="outer")
+        # Município ausente de uma aba: marcador falso, contagem zero
+        for resumo in resumos:
+            for coluna in resumo.columns:
+                if pd.api.types.is_bool_dtype(resumo[coluna]):
+                    tabela[coluna] = tabela[coluna].fillna(False).astype(bool)
+                elif pd.api.types.is_integer_dtype(resumo[coluna]):
+                    tabela[coluna] = tabela[coluna].fillna(0).astype(int)
+        # Nome de cada município com a grafia da primeira aba (na ordem do painel) em que aparece
+        nomes = {}
+        for aba, entrada in validas:
+            for id_municipio, nome in nomes_na_aba(entrada, aba.coluna_chave).items():
+                nomes.setdefault(id_municipio, nome)
+        tabela.insert(0, "Município", pd.Categorical([nomes[id_municipio] for id_municipio in tabela.index]))
+        # Ordem alfabética do nome (sem acentos nem caixa), não a do id, que é só a ordem de chegada
+        df = tabela.reset_index().sort_values(
+            "Município", key=lambda serie: serie.astype(str).map(normalizar_nome), ignore_index=True
+        )
+        return EntradaCache(df, time.time(), versao, avisos=avisos)
+
+visao_360 = Visao360()
+
+def aba_visao_360(abas, nome, titulo, arquivo, rotulo_municipios):
+    # Aba montada a partir das outras: passa pelo mesmo motor (filtros, tabela, exportação)
+    fontes = tuple(aba for aba in abas if aba.fonte is None and nome_da_aba(aba.url) in RESUMOS)
+    return Aba(
+        nome=nome,
+        titulo=titulo,
+        url="",
+        arquivo=arquivo,
+        filtros=(Filtro("Município", rotulo_municipios),),
+        fonte=lambda: visao_360.obter(fontes, obter_cache_abas().obter),
+    )